@@ -85,7 +85,7 @@ fi
 
 run_step_video() {
   local VIDEO
-  VIDEO="$(find "$PROJECT_DIR" -maxdepth 1 -type f \( -name "*.mov" -o -name "*.mp4" \) | head -1)"
+  VIDEO="$(find "$PROJECT_DIR" -maxdepth 1 -type f \( -name "*.mov" -o -name "*.mp4" -o -name "*.MOV" -o -name "*.MP4" \) ! -name ".*" | head -1)"
   if [[ -z "$VIDEO" ]]; then
     echo "Error: no .mov or .mp4 found in $PROJECT_DIR"
     exit 1
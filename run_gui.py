@@ -3,16 +3,30 @@
 GUI to select project, set parameters (blur, matcher, image set), see latest step,
 and run the pipeline in a new terminal window for raw output and easy debugging.
 """
+import base64
+import errno
+import os
+import shlex
+import shutil
 import subprocess
 import sys
-from datetime import datetime
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
+from typing import Optional
+
+from src.image_files import is_image_name
 
 ROOT = Path(__file__).resolve().parent
 DATA_DIR = ROOT / "data"
 RUN_SH = ROOT / "run.sh"
+_RUN_SH_STR = str(RUN_SH)  # argv[0] for every run, converted once
 # Dock/window icon: put your icon at resources/icon.png (e.g. 256×256 or 512×512 PNG)
 ICON_PATH = ROOT / "resources" / "image.png"
+# Read once; both the Tk window icon and the macOS dock icon are built from these bytes
+_ICON_BYTES = ICON_PATH.read_bytes() if ICON_PATH.is_file() else None
 
 # Artifacts that would be overwritten when starting from each step (only these are checked/archived)
 ARTIFACTS_BY_FROM_STEP = {
@@ -24,70 +38,126 @@ ARTIFACTS_BY_FROM_STEP = {
     "sparse_reconstruction": ["dense"],
     "dense_reconstruction": ["dense"],
 }
+# Probe order for has_existing_pipeline_data: files are answered from the scan alone, then dirs
+# most likely to be populated first; names not listed here are probed last, never dropped
+_PROBE_RANK = {n: i for i, n in enumerate(
+    ["database.db", "blur_histogram.png", "dense", "sparse", "images_resized_filtered", "images_resized", "images"]
+)}
+# from_step -> artifact names in probe order, built once at import
+_ARTIFACT_PROBES = {
+    step: tuple(sorted(names, key=lambda n: _PROBE_RANK.get(n, len(_PROBE_RANK))))
+    for step, names in ARTIFACTS_BY_FROM_STEP.items()
+}
+# Project-dir files that get_latest_step treats as video input (see run.sh step "video")
+_VIDEO_SUFFIXES = frozenset({".mov", ".mp4", ".MOV", ".MP4"})
+
+# Archiving runs here so large moves do not freeze the Tk main loop
+_archive_pool = ThreadPoolExecutor(max_workers=1)
+# Latest-step scans run here so a slow (e.g. NFS) project dir cannot block the Tk main loop
+_scan_pool = ThreadPoolExecutor(max_workers=1)
 
 
 def get_projects():
-    if not DATA_DIR.is_dir():
+    try:
+        it = os.scandir(DATA_DIR)
+    except (FileNotFoundError, NotADirectoryError):
         return []
-    return sorted(
-        d.name for d in DATA_DIR.iterdir()
-        if d.is_dir() and not d.name.startswith(".")
-    )
+    with it:
+        return sorted(
+            e.name for e in it
+            if not e.name.startswith(".") and e.is_dir()
+        )
+
+
+def _scan(path) -> dict:
+    """Entries of path as {name: os.DirEntry}; empty if path is missing or not a directory."""
+    try:
+        with os.scandir(path) as it:
+            return {e.name: e for e in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+def _nonempty(path) -> bool:
+    """True if path is a directory with at least one entry (reads a single readdir entry)."""
+    try:
+        with os.scandir(path) as it:
+            return next(it, None) is not None
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+
+
+def _dir_has_image(path) -> bool:
+    """True as soon as one entry of path is an image the pipeline accepts (stops at the first hit)."""
+    try:
+        with os.scandir(path) as it:
+            return any(is_image_name(e.name) for e in it)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
 
 
 def get_latest_step(project_dir: Path) -> str:
-    project_dir = Path(project_dir)
-    if not project_dir.is_dir():
+    # One scandir of the project dir; DirEntry.is_dir()/is_file() reuse the readdir type
+    entries = _scan(project_dir)
+    if not entries:
         return "—"
-    dense = project_dir / "dense"
-    if dense.is_dir() and any((dense / d.name / "fused.ply").exists() for d in dense.iterdir() if d.is_dir()):
-        return "dense_reconstruction"
-    sparse = project_dir / "sparse"
-    if sparse.is_dir() and any(sparse.iterdir()):
+    dense = entries.get("dense")
+    if dense is not None and dense.is_dir():
+        if any(d.is_dir() and os.path.exists(os.path.join(d.path, "fused.ply")) for d in _scan(dense.path).values()):
+            return "dense_reconstruction"
+    sparse = entries.get("sparse")
+    if sparse is not None and sparse.is_dir() and _nonempty(sparse.path):
         return "sparse_reconstruction"
-    if (project_dir / "database.db").is_file():
+    db = entries.get("database.db")
+    if db is not None and db.is_file():
         return "feature_matching"
-    if (project_dir / "images_resized").is_dir() and list((project_dir / "images_resized").glob("*.jpg")):
-        return "images_resized"
-    if (project_dir / "images").is_dir() and list((project_dir / "images").glob("*.jpg")):
-        return "images"
-    videos = list(project_dir.glob("*.mov")) + list(project_dir.glob("*.mp4"))
-    if videos:
+    for name in ("images_resized", "images"):
+        entry = entries.get(name)
+        if entry is not None and entry.is_dir() and _dir_has_image(entry.path):
+            return name
+    if any(
+        not name.startswith(".") and os.path.splitext(name)[1] in _VIDEO_SUFFIXES and e.is_file()
+        for name, e in entries.items()
+    ):
         return "video"
     return "—"
 
 
 def has_existing_pipeline_data(project_dir: Path, from_step: str) -> bool:
     """True if any artifact that would be overwritten when starting from from_step exists."""
-    project_dir = Path(project_dir)
-    names = ARTIFACTS_BY_FROM_STEP.get(from_step, [])
-    for name in names:
-        p = project_dir / name
-        if p.exists():
-            if p.is_dir():
-                if name in ("sparse", "dense") or list(p.glob("*")):
-                    return True
-            else:
-                return True
+    present = _scan(project_dir)
+    for name in _ARTIFACT_PROBES.get(from_step, ()):
+        entry = present.get(name)
+        if entry is None:
+            continue
+        # Empty leftover dirs (including sparse/dense) are not worth archiving
+        if not entry.is_dir() or _nonempty(entry.path):
+            return True
     return False
 
 
-def archive_project_data(project_dir: Path, from_step: str) -> Path:
-    """Move only artifacts that would be overwritten (from from_step onward) into archive_YYYYMMDD_HHMMSS/."""
+def archive_project_data(project_dir: Path, from_step: str) -> Optional[Path]:
+    """Move only artifacts that would be overwritten (from from_step onward) into archive_YYYYMMDD_HHMMSS/.
+
+    Returns None (and creates no archive dir) when none of those artifacts exist.
+    """
     project_dir = Path(project_dir)
-    names = ARTIFACTS_BY_FROM_STEP.get(from_step, [])
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    existing = _scan(project_dir)
+    to_move = [name for name in ARTIFACTS_BY_FROM_STEP.get(from_step, []) if name in existing]
+    if not to_move:
+        return None
+    stamp = time.strftime("%Y%m%d_%H%M%S")
     archive_dir = project_dir / f"archive_{stamp}"
     archive_dir.mkdir(parents=True, exist_ok=True)
-    for name in names:
-        src = project_dir / name
-        if not src.exists():
-            continue
-        dst = archive_dir / name
-        if src.is_dir():
-            src.rename(dst)
-        else:
-            src.rename(dst)
+    for name in to_move:
+        src = os.path.join(project_dir, name)
+        dst = os.path.join(archive_dir, name)
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src, dst)
     return archive_dir
 
 
@@ -101,22 +171,45 @@ def build_pipeline_args(
 ) -> list:
     """Build argv for run.sh (without 'bash')."""
     cmd = [
-        str(RUN_SH), project,
+        _RUN_SH_STR, project,
         "--from-step", from_step,
         "--matcher", matcher,
         "--use-image-set", use_image_set,
     ]
-    if blur_threshold.strip():
+    blur_threshold = blur_threshold.strip()
+    if blur_threshold:
         try:
-            float(blur_threshold.strip())
-            cmd += ["--blur-threshold", blur_threshold.strip()]
+            float(blur_threshold)
+            cmd.extend(("--blur-threshold", blur_threshold))
         except ValueError:
             pass
     if skip_blur_if_plot:
-        cmd += ["--skip-blur-if-plot"]
+        cmd.append("--skip-blur-if-plot")
     return cmd
 
 
+def _spawn_detached(argv: list) -> None:
+    """Start argv in a new session with stdin on /dev/null, without forking the GUI process.
+
+    stdout/stderr stay inherited so terminal startup errors show in the GUI's console.
+    Uses os.posix_spawnp (vfork/posix_spawn in libc) and reaps the child from a daemon thread;
+    falls back to subprocess.Popen on ENOEXEC or where posix_spawn cannot setsid.
+    """
+    if hasattr(os, "posix_spawnp"):
+        file_actions = [(os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0)]
+        try:
+            pid = os.posix_spawnp(argv[0], argv, os.environ, file_actions=file_actions, setsid=True)
+        except NotImplementedError:  # no POSIX_SPAWN_SETSID (e.g. older macOS SDKs)
+            pass
+        except OSError as e:
+            if e.errno != errno.ENOEXEC:
+                raise
+        else:
+            threading.Thread(target=os.waitpid, args=(pid, 0), daemon=True).start()
+            return
+    subprocess.Popen(argv, stdin=subprocess.DEVNULL, start_new_session=True)
+
+
 def run_pipeline_in_terminal(
     project: str,
     from_step: str,
@@ -129,58 +222,43 @@ def run_pipeline_in_terminal(
     args = build_pipeline_args(
         project, from_step, blur_threshold, matcher, use_image_set, skip_blur_if_plot
     )
-    # Shell command: cd to ROOT and run bash run.sh ...
+    # Shell command: cd to ROOT and run bash run.sh ... (also shown for copy/paste)
     root_str = str(ROOT)
-    run_sh = str(RUN_SH)
-    cmd_parts = [f"bash {run_sh}", project, f"--from-step {from_step}", f"--matcher {matcher}", f"--use-image-set {use_image_set}"]
-    if blur_threshold.strip():
-        try:
-            float(blur_threshold.strip())
-            cmd_parts.append(f"--blur-threshold {blur_threshold.strip()}")
-        except ValueError:
-            pass
-    if skip_blur_if_plot:
-        cmd_parts.append("--skip-blur-if-plot")
-    cmd_str = " ".join(cmd_parts)
-    # Quote cd path if it contains spaces
-    if " " in root_str:
-        cd_cmd = f'cd "{root_str}" && {cmd_str}'
-    else:
-        cd_cmd = f"cd {root_str} && {cmd_str}"
-    full_cmd = cd_cmd
+    full_cmd = f"cd {shlex.quote(root_str)} && {shlex.join(['bash', *args])}"
 
     if sys.platform == "darwin":
-        # macOS: open new Terminal window and run command
-        escaped = full_cmd.replace("\\", "\\\\").replace('"', '\\"')
-        script = f'tell application "Terminal" to do script "{escaped}"'
+        # macOS: Terminal runs a .command script directly (no AppleScript compile/round-trip)
         try:
-            subprocess.Popen(["osascript", "-e", script], start_new_session=True)
+            fd, script_path = tempfile.mkstemp(suffix=".command")
+            with os.fdopen(fd, "w") as f:
+                f.write(f'#!/bin/bash\nrm -f -- "$0"\n{full_cmd}\n')
+            os.chmod(script_path, 0o755)
+            _spawn_detached(["open", "-a", "Terminal", script_path])
             return True, full_cmd
         except Exception as e:
             return False, str(e)
     elif sys.platform.startswith("linux"):
-        # Linux: try gnome-terminal, then xterm
+        # Linux: try gnome-terminal, then xterm (posix_spawn has no cwd, so cd in the shell)
+        shell_cmd = full_cmd + "; exec bash"
         try:
-            subprocess.Popen(
-                ["gnome-terminal", "--", "bash", "-c", full_cmd + "; exec bash"],
-                start_new_session=True,
-            )
+            _spawn_detached(["gnome-terminal", "--", "bash", "-c", shell_cmd])
             return True, full_cmd
         except FileNotFoundError:
             try:
-                subprocess.Popen(["xterm", "-e", full_cmd + "; exec bash"], start_new_session=True)
+                _spawn_detached(["xterm", "-e", "bash", "-c", shell_cmd])
                 return True, full_cmd
             except FileNotFoundError:
                 return False, "No terminal found (tried gnome-terminal, xterm)"
         except Exception as e:
             return False, str(e)
     else:
-        # Windows: start cmd in new window
+        # Windows: start cmd in new window (inherits cwd=ROOT). One cmd-level string: a list would be
+        # re-quoted by list2cmdline with \" escapes that cmd.exe does not understand.
         try:
             subprocess.Popen(
-                ["start", "cmd", "/k", f"cd /d {root_str} && bash {run_sh} {project} --from-step {from_step} --matcher {matcher} --use-image-set {use_image_set}"],
+                f"start cmd /k {subprocess.list2cmdline(['bash', *args])}",
                 shell=True,
-                cwd=str(ROOT),
+                cwd=root_str,
             )
             return True, full_cmd
         except Exception as e:
@@ -188,27 +266,31 @@ def run_pipeline_in_terminal(
 
 
 def _set_app_icon(root):
-    """Set window icon and, on macOS, the dock icon."""
-    import sys
-    if not ICON_PATH.is_file():
+    """Set window icon (the macOS dock icon is set later, see _set_dock_icon)."""
+    if _ICON_BYTES is None:
         return
     try:
         from tkinter import PhotoImage
-        img = PhotoImage(file=str(ICON_PATH))
+        img = PhotoImage(data=base64.b64encode(_ICON_BYTES))
         root.iconphoto(True, img)  # window + task switcher
         root._icon_photo = img  # keep reference so icon is not garbage-collected
     except Exception:
         pass
-    # macOS dock icon (requires: pip install pyobjc-framework-Cocoa)
-    if sys.platform == "darwin":
-        try:
-            from AppKit import NSApplication, NSImage
-            nsapp = NSApplication.sharedApplication()
-            icon = NSImage.alloc().initWithContentsOfFile_(str(ICON_PATH))
-            if icon is not None:
-                nsapp.setApplicationIconImage_(icon)
-        except Exception:
-            pass
+
+
+def _set_dock_icon():
+    """macOS dock icon (requires: pip install pyobjc-framework-Cocoa)."""
+    if _ICON_BYTES is None:
+        return
+    try:
+        from AppKit import NSApplication, NSData, NSImage
+        nsapp = NSApplication.sharedApplication()
+        data = NSData.dataWithBytes_length_(_ICON_BYTES, len(_ICON_BYTES))
+        icon = NSImage.alloc().initWithData_(data)
+        if icon is not None:
+            nsapp.setApplicationIconImage_(icon)
+    except Exception:
+        pass
 
 
 def main():
@@ -244,7 +326,20 @@ def main():
         if not p or p == "(no projects in data/)":
             latest_var.set("—")
             return
-        latest_var.set(get_latest_step(DATA_DIR / p))
+        fut = _scan_pool.submit(get_latest_step, DATA_DIR / p)
+        try:
+            # Local disks answer well within this; only slow filesystems fall through to polling
+            latest_var.set(fut.result(timeout=0.05))
+        except FutureTimeoutError:
+            latest_var.set("…")
+            root.after(50, lambda: poll_latest(fut, p))
+
+    def poll_latest(fut, p):
+        if not fut.done():
+            root.after(50, lambda: poll_latest(fut, p))
+            return
+        if project_var.get().strip() == p:  # ignore results for a project no longer selected
+            latest_var.set(fut.result())
 
     latest_label = ttk.Label(main_frame, textvariable=latest_var)
     latest_label.grid(row=1, column=1, sticky=tk.W, pady=2, padx=(8, 0))
@@ -317,16 +412,34 @@ def main():
             if choice is None:  # Cancel
                 return
             if choice is True:  # Archive
-                try:
-                    archive_path = archive_project_data(proj_dir, from_step)
-                    log_area.delete("1.0", tk.END)
-                    log_area.insert(tk.END, f"Archived to:\n{archive_path}\n\n")
-                    log_area.see(tk.END)
-                except Exception as e:
-                    messagebox.showerror("Archive failed", str(e))
-                    return
+                run_btn.state(["disabled"])
+                log_area.delete("1.0", tk.END)
+                log_area.insert(tk.END, "Archiving existing data...\n")
+                fut = _archive_pool.submit(archive_project_data, proj_dir, from_step)
+                root.after(50, lambda: poll_archive(fut, p, from_step))
+                return
 
-        from_step = from_step_var.get()
+        start_pipeline(p, from_step)
+
+    def poll_archive(fut, p, from_step):
+        if not fut.done():
+            root.after(50, lambda: poll_archive(fut, p, from_step))
+            return
+        run_btn.state(["!disabled"])
+        try:
+            archive_path = fut.result()
+        except Exception as e:
+            messagebox.showerror("Archive failed", str(e))
+            return
+        log_area.delete("1.0", tk.END)
+        if archive_path is None:
+            log_area.insert(tk.END, "Nothing to archive.\n\n")
+        else:
+            log_area.insert(tk.END, f"Archived to:\n{archive_path}\n\n")
+        log_area.see(tk.END)
+        start_pipeline(p, from_step)
+
+    def start_pipeline(p, from_step):
         blur_threshold = blur_var.get()
         matcher = matcher_var.get()
         use_image_set = use_image_set_var.get()
@@ -372,6 +485,9 @@ def main():
         root.after(100, lambda: root.attributes("-topmost", False))
         root.focus_force()
     root.after(1, bring_to_front)
+    if sys.platform == "darwin":
+        # AppKit import (slow on a cold disk) after the form is up; AppKit must stay on the main thread
+        root.after(200, _set_dock_icon)
 
     root.mainloop()
 
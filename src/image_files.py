@@ -0,0 +1,19 @@
+"""
+Image file discovery shared by resize_imges.py, blur_analysis.py and the GUI.
+"""
+import os
+from pathlib import Path
+
+# Support both .jpg and .JPG (and .jpeg/.JPEG) so we can use photo sets
+IMAGE_EXTS = frozenset({".jpg", ".JPG", ".jpeg", ".JPEG"})
+
+
+def is_image_name(name):
+    """True for a non-hidden name with an image suffix (hidden names skipped as glob("*.jpg") did)."""
+    return not name.startswith(".") and os.path.splitext(name)[1] in IMAGE_EXTS
+
+
+def list_images(input_dir):
+    """Image files directly in input_dir, from a single os.scandir."""
+    with os.scandir(input_dir) as it:
+        return [Path(e.path) for e in it if is_image_name(e.name) and e.is_file()]
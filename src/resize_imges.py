@@ -1,9 +1,27 @@
 from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from tqdm import tqdm
 import argparse
+import os
+
+from image_files import list_images
 
 MAX_SIZE = 2000  # max width or height
+JPEG_QUALITY = 95
+# 4:2:0 chroma (Pillow subsampling=2): half the chroma data to encode; COLMAP's SIFT runs on luminance.
+# Set to 0 (4:4:4) if full-resolution colour matters for the dense point cloud.
+JPEG_SUBSAMPLING = 2
+
+
+def _resize_one(img_path, output_dir):
+    """Decode, shrink to MAX_SIZE and re-encode one image (runs in a worker process)."""
+    img = Image.open(img_path)
+    # thumbnail() first draft()s JPEGs (libjpeg DCT scaling) down to >= 2 * MAX_SIZE, so most
+    # pixels of large photos are never decoded; LANCZOS then does the final, quality-relevant step
+    img.thumbnail((MAX_SIZE, MAX_SIZE), Image.LANCZOS)
+    img.save(output_dir / img_path.name, quality=JPEG_QUALITY, subsampling=JPEG_SUBSAMPLING)
 
 
 def main():
@@ -26,16 +44,14 @@ def main():
         raise SystemExit(f"Input directory not found: {input_dir}")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Support both .jpg and .JPG (and .jpeg/.JPEG) so we can use photo sets
-    patterns = ("*.jpg", "*.JPG", "*.jpeg", "*.JPEG")
-    img_paths = []
-    for pat in patterns:
-        img_paths.extend(input_dir.glob(pat))
+    paths = sorted(list_images(input_dir))
 
-    for img_path in tqdm(sorted(img_paths)):
-        img = Image.open(img_path)
-        img.thumbnail((MAX_SIZE, MAX_SIZE), Image.LANCZOS)
-        img.save(output_dir / img_path.name, quality=95, subsampling=0)
+    # JPEG decode/encode dominates and is independent per image: overlap it across all cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        list(tqdm(
+            ex.map(partial(_resize_one, output_dir=output_dir), paths, chunksize=4), total=len(paths),
+            smoothing=0, miniters=len(paths) // 100 or 1,
+        ))
 
 
 if __name__ == "__main__":